@@ -1,217 +1,566 @@
+import atexit
+import functools
+import itertools
+import logging
+import pathlib
 import sqlite3
-from datetime import datetime
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 
 # NOTE: This is where we define the database filename. Keep it simple.
 DATABASE_FILE = "personal_finance.db" 
 
+# Status messages from the functions below go through this logger instead of print(),
+# so a big import loop isn't stuck writing a line to the console for every row.
+# Nothing below WARNING shows up unless the caller turns it on (main() does).
+LOG = logging.getLogger(__name__)
+
+# --- SQL we run over and over ---
+# Keeping these as fixed strings means SQLite's statement cache can reuse the
+# already-compiled version instead of re-parsing the SQL on every call.
+_SELECT_CATEGORY_ID_SQL = "SELECT category_id FROM categories WHERE name = ?"
+# Only inserts when the name isn't there yet, so duplicates are skipped quietly
+# instead of raising an error. (INSERT OR IGNORE would do that too, but it still
+# bumps the AUTOINCREMENT counter on every skipped duplicate.)
+_INSERT_CATEGORY_SQL = """
+    INSERT INTO categories (name)
+    SELECT ? WHERE NOT EXISTS (SELECT 1 FROM categories WHERE name = ?)
+"""
+_SELECT_ALL_CATEGORIES_SQL = "SELECT category_id, name FROM categories ORDER BY name"
+# Batch imports look category names up this many at a time. The SQL never changes
+# size (a short last chunk is padded with NULLs, which never match), so it stays one
+# cached statement and stays well under SQLite's limit on ? placeholders.
+_CATEGORY_LOOKUP_CHUNK_SIZE = 32
+_SELECT_CATEGORY_IDS_SQL = (
+    "SELECT category_id, name FROM categories WHERE name IN ("
+    + ", ".join("?" * _CATEGORY_LOOKUP_CHUNK_SIZE)
+    + ")"
+)
+_INSERT_EXPENSE_SQL = "INSERT INTO expenses (amount, date, description, category_id) VALUES (?, ?, ?, ?)"
+# Same insert, but SQLite finds the category_id from the name itself (no row = no such category)
+_INSERT_EXPENSE_BY_CATEGORY_NAME_SQL = """
+    INSERT INTO expenses (amount, date, description, category_id)
+    SELECT ?, ?, ?, category_id FROM categories WHERE name = ?
+"""
+_DELETE_EXPENSE_SQL = "DELETE FROM expenses WHERE expense_id = ?"
+_SELECT_EXPENSES_BASE_SQL = """
+    SELECT
+        e.expense_id,
+        e.amount,
+        e.date,
+        e.description,
+        c.name as category_name
+    FROM expenses e
+    JOIN categories c ON e.category_id = c.category_id
+"""
+# For paging: only rows that come after (older than) the last one already shown.
+# This walks the (date, expense_id) index, so it doesn't matter how deep the page is.
+_SELECT_EXPENSES_BEFORE_SQL = "    WHERE (e.date, e.expense_id) < (?, ?)\n"
+_SELECT_EXPENSES_ORDER_SQL = "    ORDER BY e.date DESC, e.expense_id DESC -- Show the newest stuff first\n"
+# The four versions of the report query, keyed by (paging from a row?, limited?)
+_SELECT_EXPENSES_SQL = {
+    (has_before, has_limit): (
+        _SELECT_EXPENSES_BASE_SQL
+        + (_SELECT_EXPENSES_BEFORE_SQL if has_before else "")
+        + _SELECT_EXPENSES_ORDER_SQL
+        + ("    LIMIT ?\n" if has_limit else "")
+    )
+    for has_before in (False, True)
+    for has_limit in (False, True)
+}
+
+# reviseExpense can change any mix of (amount, description, category), which
+# is only 7 possible UPDATE statements. We build them all once up front so every
+# call reuses the same SQL text. The table is indexed by a 3-bit mask of the
+# fields being changed (1 = amount, 2 = description, 4 = category), and each
+# entry also says which of (amount, description, category) to pass, in order.
+# Entries that change the category get a second version that takes the category
+# NAME and looks the ID up inside the UPDATE itself. It only touches the row if
+# that category exists, so we don't need a separate SELECT first.
+_UPDATE_COLUMNS = ("amount", "description", "category_id")
+_UPDATE_TABLE = [None] * 8
+for _flags in range(1, 8):
+    _order = tuple(bit for bit in range(3) if _flags & (1 << bit))
+    _set_clause = ", ".join(f"{_UPDATE_COLUMNS[bit]} = ?" for bit in _order)
+    _by_name_sql = None
+    if _flags & 4:
+        _by_name_set_clause = _set_clause.replace(
+            "category_id = ?", "category_id = (SELECT category_id FROM categories WHERE name = ?)"
+        )
+        _by_name_sql = (
+            f"UPDATE expenses SET {_by_name_set_clause} WHERE expense_id = ?"
+            " AND EXISTS (SELECT 1 FROM categories WHERE name = ?)"
+        )
+    _UPDATE_TABLE[_flags] = (f"UPDATE expenses SET {_set_clause} WHERE expense_id = ?", _by_name_sql, _order)
+del _flags, _order, _set_clause, _by_name_sql, _by_name_set_clause
+
+# One connection for the whole module. Opening a fresh one for every little
+# operation was wasting time (and throwing away SQLite's page cache each time).
+_CONN = None
+_CONN_LOCK = threading.Lock()
+
+def _get_conn():
+    """Hands back the shared connection, creating it the first time it's needed."""
+    global _CONN
+    if _CONN is None:
+        with _CONN_LOCK:
+            if _CONN is None:
+                _CONN = sqlite3.connect(DATABASE_FILE, check_same_thread=False, cached_statements=256)
+                # Close it cleanly when the program exits.
+                atexit.register(_CONN.close)
+    return _CONN
+
+# The shared connection is used from more than one thread (main() imports a batch
+# in the background), but it only has one transaction. So only one thread gets to
+# write at a time: each write function holds this lock while it runs, and
+# begin_transaction() holds it until the matching commit or rollback.
+# It's reentrant so the write functions still work inside your own transaction.
+_WRITE_LOCK = threading.RLock()
+
+def _serialized_write(write_function):
+    """Decorator that makes a write function wait its turn for the shared connection."""
+    @functools.wraps(write_function)
+    def wrapper(*args, **kwargs):
+        with _WRITE_LOCK:
+            try:
+                return write_function(*args, **kwargs)
+            finally:
+                # Outside begin_transaction() nothing should still be open by now (say,
+                # if a commit blew up). Roll it back rather than hand it to the next writer.
+                conn = _get_conn()
+                if conn.in_transaction and not getattr(_TRANSACTION_STATE, "is_open", False):
+                    conn.rollback()
+    return wrapper
+
+# Each thread keeps one cursor on the shared connection and reuses it, instead of
+# making a brand new cursor object for every single operation.
+_THREAD_CURSORS = threading.local()
+
+def _get_cursor():
+    """Hands back this thread's reusable cursor on the shared connection."""
+    cursor = getattr(_THREAD_CURSORS, "cursor", None)
+    if cursor is None:
+        cursor = _THREAD_CURSORS.cursor = _get_conn().cursor()
+    return cursor
+
+def _open_read_conn():
+    """
+    Opens a separate read-only connection for one report. With WAL turned on, reading
+    through it doesn't get in the way of writes happening on the main connection.
+    Each report gets its own, because a half-read cursor keeps its snapshot of the
+    database open and a shared connection would hand that stale view to the next report.
+    """
+    # as_uri() escapes characters like ?, # and % in the path so SQLite reads it right
+    read_only_uri = pathlib.Path(DATABASE_FILE).absolute().as_uri() + "?mode=ro"
+    return sqlite3.connect(read_only_uri, uri=True, check_same_thread=False)
+
+# Category names hardly ever change while the program runs, so we remember
+# name -> category_id here instead of asking the database every single time.
+_CATEGORY_CACHE = {}
+
+def _lookup_category_id(cursor, cat_name):
+    """Returns the ID for a category name (or None), checking our cache first."""
+    cat_id = _CATEGORY_CACHE.get(cat_name)
+    if cat_id is None:
+        cursor.execute(_SELECT_CATEGORY_ID_SQL, (cat_name,))
+        cat_result = cursor.fetchone()
+        if cat_result is None:
+            return None
+        cat_id = _CATEGORY_CACHE[cat_name] = cat_result[0]
+    return cat_id
+
+# --- Transactions (group a bunch of writes into one commit) ---
+
+# Remembers whether this thread opened a transaction (and so is holding _WRITE_LOCK)
+_TRANSACTION_STATE = threading.local()
+
+def begin_transaction():
+    """
+    Starts an explicit transaction on the shared connection. While it's open,
+    the write functions below skip their own commit, so everything lands in
+    one commit when you call commit_transaction(). Other threads that want to
+    write will wait until then.
+    """
+    if getattr(_TRANSACTION_STATE, "is_open", False):
+        return # This thread already has one going
+    _WRITE_LOCK.acquire()
+    _TRANSACTION_STATE.is_open = True
+    conn = _get_conn()
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+
+def _end_transaction():
+    """Lets other threads write again once our transaction is finished."""
+    if getattr(_TRANSACTION_STATE, "is_open", False):
+        _TRANSACTION_STATE.is_open = False
+        _WRITE_LOCK.release()
+
+def commit_transaction():
+    """
+    Commits whatever was written since begin_transaction(). If the commit fails
+    (database busy, disk trouble...), everything gets rolled back and the error
+    is raised again, so the next writer never inherits a half-finished transaction.
+    """
+    try:
+        _get_conn().commit()
+    except sqlite3.Error:
+        rollback_transaction()
+        raise
+    _end_transaction()
+
+def rollback_transaction():
+    """Throws away everything written since begin_transaction()."""
+    conn = _get_conn()
+    try:
+        conn.rollback()
+        # Categories added during the transaction are gone now, so forget their IDs too
+        _CATEGORY_CACHE.clear()
+    finally:
+        # Only let other threads in once the transaction is really closed. If the
+        # rollback itself failed, this thread keeps the lock and can try again.
+        if not conn.in_transaction:
+            _end_transaction()
+
 # --- Database Initialization (Setting up the Tables) ---
 
+# Flipped to True once setup_database_tables() has run, so calling it again is free
+_SCHEMA_READY = False
+# The tables and indexes setup_database_tables() should leave behind
+_EXPECTED_SCHEMA_OBJECTS = {"categories", "expenses", "ix_expenses_category_id", "ix_expenses_date_id_desc"}
+_SELECT_SCHEMA_OBJECTS_SQL = """
+    SELECT name FROM sqlite_master
+    WHERE name IN ('categories', 'expenses', 'ix_expenses_category_id', 'ix_expenses_date_id_desc', 'ix_expenses_date')
+"""
+
+@_serialized_write
 def setup_database_tables():
     """
     Connects to the database file (or creates it if it's missing) 
     and makes sure our two main tables are ready to go.
     """
-    # A developer might forget to close the connection, but we won't!
-    conn = sqlite3.connect(DATABASE_FILE)
-    db_cursor = conn.cursor()
-
-    # 1. Category Lookup Table
-    # Gotta have a unique name for each category, or things get messy.
-    db_cursor.execute("""
-        CREATE TABLE IF NOT EXISTS categories (
-            category_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL
-        )
-    """)
-
-    # 2. Main Expense Log Table
-    # The category_id links back to the categories table. It's important!
-    db_cursor.execute("""
-        CREATE TABLE IF NOT EXISTS expenses (
-            expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            amount REAL NOT NULL,
-            date TEXT NOT NULL, -- Stored as YYYY-MM-DD, which is good for sorting
-            description TEXT,
-            category_id INTEGER,
-            FOREIGN KEY (category_id) REFERENCES categories(category_id)
+    # Everything below was already done earlier in this run, so skip it all
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+
+    conn = _get_conn()
+    db_cursor = _get_cursor()
+
+    # Speed tweaks: WAL means fewer fsyncs per commit (and readers don't block
+    # writers), and a bigger cache keeps the hot pages in memory.
+    db_cursor.execute("PRAGMA journal_mode=WAL;")
+    db_cursor.execute("PRAGMA synchronous=NORMAL;")
+    db_cursor.execute("PRAGMA temp_store=MEMORY;")
+    db_cursor.execute("PRAGMA cache_size=-64000;") # Negative means KiB, so ~64MB
+    db_cursor.execute("PRAGMA mmap_size=268435456;") # 256MB
+
+    # Only run the CREATE statements if something is missing (or the old date
+    # index is still hanging around). On a normal startup it's all there already.
+    db_cursor.execute(_SELECT_SCHEMA_OBJECTS_SQL)
+    existing_objects = {row[0] for row in db_cursor.fetchall()}
+    if existing_objects != _EXPECTED_SCHEMA_OBJECTS:
+        # 1. Category Lookup Table
+        # Gotta have a unique name for each category, or things get messy.
+        db_cursor.execute("""
+            CREATE TABLE IF NOT EXISTS categories (
+                category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL
+            )
+        """)
+
+        # 2. Main Expense Log Table
+        # The category_id links back to the categories table. It's important!
+        db_cursor.execute("""
+            CREATE TABLE IF NOT EXISTS expenses (
+                expense_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                amount REAL NOT NULL,
+                date TEXT NOT NULL, -- Stored as YYYY-MM-DD, which is good for sorting
+                description TEXT,
+                category_id INTEGER,
+                FOREIGN KEY (category_id) REFERENCES categories(category_id)
+            )
+        """)
+
+        # 3. Indexes
+        # Category name lookups are already index-only: the UNIQUE constraint makes an
+        # index on name, and category_id is the rowid, so it's stored right in there.
+        # These two help the report's JOIN and its ORDER BY: SQLite can walk the
+        # (date, expense_id) index in order instead of sorting everything, newest first.
+        db_cursor.execute("CREATE INDEX IF NOT EXISTS ix_expenses_category_id ON expenses(category_id)")
+        db_cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_expenses_date_id_desc ON expenses(date DESC, expense_id DESC)"
         )
-    """)
+        # The older date-only index does the same job, no point keeping both up to date
+        db_cursor.execute("DROP INDEX IF EXISTS ix_expenses_date")
 
-    conn.commit()
-    # Always remember to close the connection when done.
-    conn.close()
+        conn.commit()
+
+    _SCHEMA_READY = True
 
 # --- Category Management ---
 
+@_serialized_write
 def addNewCategory(categoryName):
     """Adds a new expense category to the list."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+    conn = _get_conn()
+    cursor = _get_cursor()
+    # If someone already called begin_transaction(), leave the commit to them
+    in_outer_transaction = conn.in_transaction
+
     try:
         # Simple INSERT query
-        cursor.execute("INSERT INTO categories (name) VALUES (?)", (categoryName,))
+        cursor.execute(_INSERT_CATEGORY_SQL, (categoryName, categoryName))
+    except sqlite3.IntegrityError as err:
+        # The NOT EXISTS check handles normal duplicates, but a missing name (NULL)
+        # or another program adding the same name at the same moment still ends up here.
+        if not in_outer_transaction:
+            conn.rollback()
+        LOG.error("Category '%s' could not be added: %s", categoryName, err)
+        return None
+    if not in_outer_transaction:
         conn.commit()
-        print(f"Category '{categoryName}' added successfully.")
-        return cursor.lastrowid
-    except sqlite3.IntegrityError:
+    if cursor.rowcount == 0:
         # A common mistake: trying to add the same category twice.
-        print(f"Category '{categoryName}' already exists. Skipping operation.")
+        LOG.warning("Category '%s' already exists. Skipping operation.", categoryName)
         return None
-    finally:
-        conn.close()
+    LOG.info("Category '%s' added successfully.", categoryName)
+    _CATEGORY_CACHE[categoryName] = cursor.lastrowid
+    return cursor.lastrowid
 
 def getAllCategories():
     """Fetches all available categories. We order them by name just to make the list look nice."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT category_id, name FROM categories ORDER BY name")
+    cursor = _get_cursor()
+    cursor.execute(_SELECT_ALL_CATEGORIES_SQL)
     category_list = cursor.fetchall()
-    conn.close()
     return category_list
 
 # --- Expense Management (The core functionality) ---
 
+@_serialized_write
 def record_new_spending(money_spent, note_description, cat_name, transaction_date=None):
     """
     Logs a new expense. It's a bit awkward because we need the category NAME 
-    but the database needs the category ID.
+    but the database needs the category ID, so either the cache or SQLite
+    itself turns the name into an ID. Either way it's just one statement.
     """
     if transaction_date is None:
         # Use today if no date is given. Standard practice.
-        transaction_date = datetime.now().strftime("%Y-%m-%d")
+        transaction_date = date.today().isoformat() # Same YYYY-MM-DD, minus the strftime
 
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+    conn = _get_conn()
+    cursor = _get_cursor()
+    in_outer_transaction = conn.in_transaction
 
-    # Step 1: Get the ID from the name
-    cursor.execute("SELECT category_id FROM categories WHERE name = ?", (cat_name,))
-    cat_result = cursor.fetchone()
-    
-    if cat_result is None:
-        print(f"Error: Couldn't find the category '{cat_name}'. Please verify the spelling or add it first.")
-        conn.close()
-        return None
+    actual_category_id = _CATEGORY_CACHE.get(cat_name)
 
-    actual_category_id = cat_result[0]
-
-    # Step 2: Insert the actual expense record
     try:
-        cursor.execute(
-            "INSERT INTO expenses (amount, date, description, category_id) VALUES (?, ?, ?, ?)",
-            (money_spent, transaction_date, note_description, actual_category_id)
-        )
-        conn.commit()
-        print(f"Expense of ${money_spent:.2f} logged under '{cat_name}'.")
+        if actual_category_id is not None:
+            cursor.execute(
+                _INSERT_EXPENSE_SQL,
+                (money_spent, transaction_date, note_description, actual_category_id)
+            )
+        else:
+            # Not cached, so let the INSERT look the name up on its own
+            cursor.execute(
+                _INSERT_EXPENSE_BY_CATEGORY_NAME_SQL,
+                (money_spent, transaction_date, note_description, cat_name)
+            )
+            if cursor.rowcount == 0:
+                # Nothing was inserted, which means the category doesn't exist
+                if not in_outer_transaction:
+                    conn.rollback()
+                LOG.error("Error: Couldn't find the category '%s'. Please verify the spelling or add it first.", cat_name)
+                return None
+        if not in_outer_transaction:
+            conn.commit()
+        LOG.info("Expense of $%.2f logged under '%s'.", money_spent, cat_name)
         return cursor.lastrowid
     except Exception as err:
-        print(f"An error occurred trying to save the expense: {err}")
+        # The connection stays open now, so undo any half-finished write
+        # (unless it's someone else's transaction, then that's their call).
+        if not in_outer_transaction:
+            conn.rollback()
+        LOG.error("An error occurred trying to save the expense: %s", err)
         return None
-    finally:
-        conn.close()
 
-def viewAllExpenses():
+@_serialized_write
+def record_many_spendings(entries):
+    """
+    Logs a whole batch of expenses in one go (handy for importing a CSV).
+    Each entry is (amount, description, category name, date) and the date can be None.
+    Everything goes in with a single executemany inside one transaction, so we
+    pay for one commit instead of one per row. Returns how many rows got saved;
+    it doesn't log the success itself, so a batch running in the background
+    doesn't print into whatever the main thread is showing.
+    """
+    entries = list(entries)
+    if not entries:
+        return 0
+
+    conn = _get_conn()
+    cursor = _get_cursor()
+
+    # Look up the category names we haven't cached yet a chunk at a time, instead of one per row
+    missing_names = list({entry[2] for entry in entries} - _CATEGORY_CACHE.keys())
+    for chunk_start in range(0, len(missing_names), _CATEGORY_LOOKUP_CHUNK_SIZE):
+        name_chunk = missing_names[chunk_start:chunk_start + _CATEGORY_LOOKUP_CHUNK_SIZE]
+        name_chunk += [None] * (_CATEGORY_LOOKUP_CHUNK_SIZE - len(name_chunk))
+        cursor.execute(_SELECT_CATEGORY_IDS_SQL, name_chunk)
+        _CATEGORY_CACHE.update((name, cat_id) for cat_id, name in cursor.fetchall())
+    category_ids = _CATEGORY_CACHE
+
+    # Work out "today" once for the whole batch, not once per row
+    today = date.today().isoformat()
+    rows_to_insert = []
+    for money_spent, note_description, cat_name, transaction_date in entries:
+        if cat_name not in category_ids:
+            LOG.error("Error: Couldn't find the category '%s'. Skipping that expense.", cat_name)
+            continue
+        if transaction_date is None:
+            transaction_date = today
+        rows_to_insert.append((money_spent, transaction_date, note_description, category_ids[cat_name]))
+
+    if not rows_to_insert:
+        return 0
+
+    # The batch is all-or-nothing either way: its own transaction normally, or a
+    # savepoint when it's running inside someone else's transaction, so a bad row
+    # halfway through can't leave the earlier rows behind.
+    in_outer_transaction = conn.in_transaction
+    try:
+        if in_outer_transaction:
+            cursor.execute("SAVEPOINT record_many_spendings")
+        else:
+            cursor.execute("BEGIN IMMEDIATE")
+        cursor.executemany(_INSERT_EXPENSE_SQL, rows_to_insert)
+        if in_outer_transaction:
+            cursor.execute("RELEASE record_many_spendings")
+        else:
+            conn.commit()
+        return len(rows_to_insert)
+    except Exception as err:
+        if in_outer_transaction:
+            cursor.execute("ROLLBACK TO record_many_spendings")
+            cursor.execute("RELEASE record_many_spendings")
+        else:
+            conn.rollback()
+        LOG.error("An error occurred trying to save the batch of expenses: %s", err)
+        return 0
+
+def viewAllExpenses(limit=None, before=None, read_only=False):
     """
     Pulls everything out of the expenses table. 
     We use a database JOIN here so we get the human-readable category name instead of a number.
+    Instead of loading every row into a list, we hand back the cursor itself so the
+    rows can be looped over one at a time (wrap it in list() if you need them all at once).
+    To page through the log, pass limit=N, then for the next page pass
+    before=(date, expense_id) of the last row you got.
+    Pass read_only=True to read through a fresh read-only connection, so the
+    report can run while another thread is busy writing. That connection goes away
+    along with the cursor once you're done with it.
     """
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT
-            e.expense_id,
-            e.amount,
-            e.date,
-            e.description,
-            c.name as category_name
-        FROM expenses e
-        JOIN categories c ON e.category_id = c.category_id
-        ORDER BY e.date DESC, e.expense_id DESC -- Show the newest stuff first
-    """)
-    all_expense_records = cursor.fetchall()
-    conn.close()
-    return all_expense_records
+    query_params = ()
+    if before is not None:
+        query_params += tuple(before)
+    if limit is not None:
+        query_params += (limit,)
 
+    conn = _open_read_conn() if read_only else _get_conn()
+    # The caller loops over this cursor, so it needs to be its own. conn.execute()
+    # makes one and runs the query in a single call.
+    return conn.execute(_SELECT_EXPENSES_SQL[(before is not None, limit is not None)], query_params)
+
+@_serialized_write
 def reviseExpense(expense_record_id, new_amt=None, new_desc=None, new_category_name=None):
     """A flexible function to update any part of an expense record by its ID."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+    conn = _get_conn()
+    cursor = _get_cursor()
+    # If someone already called begin_transaction(), leave the commit/rollback to them
+    in_outer_transaction = conn.in_transaction
     
-    updates_to_make = []
-    update_values = []
+    # Which of (amount, description, category) are we changing? One bit each.
+    flags = (new_amt is not None) | ((new_desc is not None) << 1) | ((new_category_name is not None) << 2)
+    if not flags:
+        LOG.warning("No fields provided for update. Skipping.")
+        return False
 
-    # Check for amount change
-    if new_amt is not None:
-        updates_to_make.append("amount = ?")
-        update_values.append(new_amt)
-    
-    # Check for description change
-    if new_desc is not None:
-        updates_to_make.append("description = ?")
-        update_values.append(new_desc)
+    # Pick the ready-made UPDATE that matches the fields we're changing
+    sql_query_string, by_name_sql_query_string, value_order = _UPDATE_TABLE[flags]
 
     # Check for category change (this part is complex)
-    if new_category_name is not None:
-        # We need to look up the ID again, which is a bit of extra work
-        cursor.execute("SELECT category_id FROM categories WHERE name = ?", (new_category_name,))
-        cat_lookup = cursor.fetchone()
-        if cat_lookup is None:
-            print(f"Update failed: Category '{new_category_name}' does not exist.")
-            conn.close()
-            return False
-        
-        updates_to_make.append("category_id = ?")
-        update_values.append(cat_lookup[0])
-    
-    if not updates_to_make:
-        print("No fields provided for update. Skipping.")
-        conn.close()
-        return False
-        
-    # Build the final SQL query dynamically. A common pattern in Python/SQL.
-    update_values.append(expense_record_id)
-    sql_query_string = f"UPDATE expenses SET {', '.join(updates_to_make)} WHERE expense_id = ?"
+    new_category_id = None
+    category_by_name = False
+    if flags & 4:
+        new_category_id = _CATEGORY_CACHE.get(new_category_name)
+        if new_category_id is None:
+            # Not cached, so hand the name to the UPDATE and let SQLite find the ID
+            sql_query_string = by_name_sql_query_string
+            category_by_name = True
+
+    new_values = (new_amt, new_desc, new_category_name if category_by_name else new_category_id)
+    update_values = tuple(new_values[i] for i in value_order) + (expense_record_id,)
+    if category_by_name:
+        update_values += (new_category_name,)
     
     try:
-        cursor.execute(sql_query_string, tuple(update_values))
+        cursor.execute(sql_query_string, update_values)
         if cursor.rowcount == 0:
-            print(f"Expense ID {expense_record_id} not found. Nothing changed.")
+            if not in_outer_transaction:
+                conn.rollback()
+            # Nothing changed: either the category or the expense doesn't exist
+            if category_by_name and _lookup_category_id(cursor, new_category_name) is None:
+                LOG.error("Update failed: Category '%s' does not exist.", new_category_name)
+            else:
+                LOG.warning("Expense ID %s not found. Nothing changed.", expense_record_id)
             return False
-        conn.commit()
-        print(f"Record ID {expense_record_id} successfully revised.")
+        if not in_outer_transaction:
+            conn.commit()
+        LOG.info("Record ID %s successfully revised.", expense_record_id)
         return True
     except Exception as err:
-        print(f"Error occurred during expense update: {err}")
+        if not in_outer_transaction:
+            conn.rollback()
+        LOG.error("Error occurred during expense update: %s", err)
         return False
-    finally:
-        conn.close()
 
+@_serialized_write
 def removeExpense(expenseId):
     """Permanently deletes an expense record using its unique ID."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
+    conn = _get_conn()
+    cursor = _get_cursor()
+    in_outer_transaction = conn.in_transaction
     try:
-        cursor.execute("DELETE FROM expenses WHERE expense_id = ?", (expenseId,))
+        cursor.execute(_DELETE_EXPENSE_SQL, (expenseId,))
         # Check if a row was actually deleted
         if cursor.rowcount == 0:
-            print(f"Deletion failed: Expense ID {expenseId} was not found.")
+            if not in_outer_transaction:
+                conn.rollback()
+            LOG.warning("Deletion failed: Expense ID %s was not found.", expenseId)
             return False
-        conn.commit()
-        print(f"Successfully removed expense ID {expenseId}.")
+        if not in_outer_transaction:
+            conn.commit()
+        LOG.info("Successfully removed expense ID %s.", expenseId)
         return True
     except Exception as err:
-        print(f"Database error during deletion: {err}")
+        if not in_outer_transaction:
+            conn.rollback()
+        LOG.error("Database error during deletion: %s", err)
         return False
-    finally:
-        conn.close()
 
 # --- Reporting Utility (Makes the output look less like raw data) ---
 
 def display_expense_report(expense_data):
     """
-    Takes the raw list of expenses and formats it nicely for the console.
-    This is what the user would actually see.
+    Takes the raw expenses (a list, or the cursor from viewAllExpenses) and formats
+    them nicely for the console. This is what the user would actually see.
     """
-    if not expense_data:
+    # Peek at the first row so we can tell if there's anything at all without
+    # pulling the whole result into memory.
+    expense_rows = iter(expense_data)
+    first_record = next(expense_rows, None)
+    if first_record is None:
         print("\n--- The expense log is empty! Time to start spending... or saving? ---")
         return
 
@@ -232,35 +581,48 @@ def display_expense_report(expense_data):
     print(header_line)
     print(separator)
 
+    # Build the row template once, rather than re-reading the widths for every row
+    row_template = (
+        f"{{:<{ID_WIDTH}}} | "
+        f"${{:<{AMOUNT_WIDTH-1}.2f}} | "
+        f"{{:<{DATE_WIDTH}}} | "
+        f"{{:<{CAT_WIDTH}}} | "
+        f"{{:<{DESC_WIDTH}}}"
+    )
+    format_row = row_template.format
+    # Need to truncate long descriptions so they don't break the table layout
+    TRUNCATE_AT, TRUNCATION_SUFFIX = DESC_WIDTH - 3, "..."
+    # Rows get written out in chunks instead of one print() per row
+    ROWS_PER_WRITE = 500
+
     # Loop through the records and format each one
-    for record in expense_data:
-        record_id, cost, date_str, details, category_type = record
-        
-        # Need to truncate long descriptions so they don't break the table layout
-        display_details = (details[:DESC_WIDTH-3] + '...') if len(details) > DESC_WIDTH else details
-        
-        row_output = (
-            f"{record_id:<{ID_WIDTH}} | "
-            f"${cost:<{AMOUNT_WIDTH-1}.2f} | "
-            f"{date_str:<{DATE_WIDTH}} | "
-            f"{category_type:<{CAT_WIDTH}} | "
-            f"{display_details:<{DESC_WIDTH}}"
-        )
-        print(row_output)
-        
+    pending_lines = []
+    for record_id, cost, date_str, details, category_type in itertools.chain((first_record,), expense_rows):
+        display_details = (details[:TRUNCATE_AT] + TRUNCATION_SUFFIX) if len(details) > DESC_WIDTH else details
+        pending_lines.append(format_row(record_id, cost, date_str, category_type, display_details))
+        if len(pending_lines) >= ROWS_PER_WRITE:
+            sys.stdout.write("\n".join(pending_lines) + "\n")
+            pending_lines.clear()
+
+    if pending_lines:
+        sys.stdout.write("\n".join(pending_lines) + "\n")
     print(separator)
 
 def main():
     """The main demonstration script."""
+    # Show the functions' status messages on the console, just like plain prints
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     print("--- Welcome to My Personal Finance CLI Tool ---")
     setup_database_tables()
     
     # --- 1. Category Setup ---
     print("\n--- Setting up Initial Categories ---")
+    begin_transaction() # One commit for all four instead of four separate ones
     addNewCategory("Food")
     addNewCategory("Transport")
     addNewCategory("Housing/Rent") # Used a longer name here
     addNewCategory("Leisure") # Renamed 'Entertainment'
+    commit_transaction()
     
     print("\n--- Check: Categories we have available ---")
     print(getAllCategories()) # Calling a different function name than used in the class
@@ -268,6 +630,7 @@ def main():
 
     # --- 2. Logging Expenses (CREATE) ---
     print("\n--- Logging Some Transactions ---")
+    begin_transaction()
     record_new_spending(25.50, "Big weekend food shop", "Food", "2023-11-20")
     record_new_spending(5.20, "Daily train ticket", "Transport", "2023-11-21")
     record_new_spending(89.99, "Internet and electric bill", "Housing/Rent", "2023-11-18")
@@ -276,11 +639,24 @@ def main():
     
     # Try adding one with a non-existent category
     record_new_spending(500.00, "New gaming PC", "Electronics", "2023-11-22")
+    commit_transaction()
 
-    # --- 3. Reviewing Logs (READ) ---
-    print("\n--- Current Expense Log Review ---")
-    current_expenses = viewAllExpenses()
-    display_expense_report(current_expenses)
+    # --- 3. Reviewing Logs (READ) while a batch imports in the background ---
+    print("\n--- Current Expense Log Review (a batch is importing in the background) ---")
+    # Start the read first: the read-only connection sees the log as it is right
+    # now, even while the batch below gets written on the other connection.
+    current_expenses = viewAllExpenses(read_only=True)
+    background_batch = [
+        (4.75, "Morning coffee", "Food", "2023-11-22"),
+        (32.00, "Monthly bus pass", "Transport", "2023-11-23"),
+        (9.99, "Streaming subscription", "Leisure", None), # No date given
+    ]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending_import = executor.submit(record_many_spendings, background_batch)
+        display_expense_report(current_expenses) # Formatting overlaps with the writer's commit
+        imported_count = pending_import.result() # Make sure the batch is in before we carry on
+    current_expenses.connection.close() # Done with this report's read-only connection
+    print(f"Logged {imported_count} expenses in one batch in the background.")
 
     # --- 4. Corrections and Updates (UPDATE) ---
     # The first expense (ID 1) was the food shop ($25.50)